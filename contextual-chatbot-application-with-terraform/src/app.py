@@ -1,11 +1,16 @@
 import streamlit as st
 import boto3
-from botocore.exceptions import ClientError
+from botocore.exceptions import ClientError, BotoCoreError
+from botocore.config import Config
 import json
 import base64
 import os
-import jmespath
 import inspect
+import time
+
+import router
+from rag_core import RagCore, ResilientRagCore, model_arn_for
+from rag_core.core import INFERENCE_PROFILE_PREFIXES
 
 from cognito import CognitoAuthenticator
 authenticator = CognitoAuthenticator()
@@ -22,7 +27,10 @@ logger.setLevel(os.getenv("LOG_LEVEL","INFO"))
 s3 = boto3.client('s3')
 
 bedrock_client = boto3.client('bedrock-agent', region_name='us-east-1')
-bedrock_agent_runtime = boto3.client('bedrock-agent-runtime')
+# Bound generation calls instead of waiting for the default botocore timeouts when Bedrock is degraded
+bedrock_agent_runtime = boto3.client('bedrock-agent-runtime',
+                                     config=Config(connect_timeout=5, read_timeout=30,
+                                                   retries={"max_attempts": 2, "mode": "standard"}))
 
  # Input for Knowledge Base ID
 # data_source_id = os.getenv("DataSourceId","")
@@ -33,6 +41,12 @@ knowledge_base_id = st.session_state.knowledge_base_id if 'knowledge_base_id' in
 data_source_id = st.session_state.data_source_id if 'data_source_id' in st.session_state else os.getenv("DataSourceId", "")
 bucket_name = st.session_state.bucket_name if 'bucket_name' in st.session_state else  os.getenv("KnowledgeBaseBucket", "")
 model_id = st.session_state.model_id if 'model_id' in st.session_state else os.getenv("ModelId", "amazon.nova-lite-v1:0")
+# Models tried when the routed model is slow, throttled or failing, comma separated per tier
+# so a strong-tier question never falls back to a model weaker than the light tier
+alternate_model_ids = {
+    "light": [m.strip() for m in os.getenv("AlternateModelIds", "").split(",") if m.strip()],
+    "strong": [m.strip() for m in os.getenv("StrongAlternateModelIds", "").split(",") if m.strip()],
+}
 
 if 'data_source_id' in st.session_state:
     data_source_id = st.session_state.data_source_id
@@ -42,19 +56,29 @@ if 'bucket_name' in st.session_state:
 
 
 
+# Cached data dependencies of the panels, so a rerun of one panel does not call S3 again
+@st.cache_data(ttl=60, show_spinner=False)
+def list_user_files(bucket, prefix):
+    response = s3.list_objects_v2(Bucket=bucket, Prefix=prefix)
+    return [obj['Key'] for obj in response.get('Contents', [])]
+
+@st.cache_data(ttl=300, max_entries=16, show_spinner=False)
+def get_file_base64(bucket, key):
+    file_obj = s3.get_object(Bucket=bucket, Key=key)
+    return base64.b64encode(file_obj['Body'].read()).decode()
+
 @st.dialog("File Content",width="large")
 def view_content(file):
     logger.info(f"Execution Started :  {inspect.currentframe().f_code.co_name}")
     try:
-        file_obj = s3.get_object(Bucket=bucket_name, Key=file)
-        file_content = file_obj['Body'].read()
-        b64 = base64.b64encode(file_content).decode()
+        b64 = get_file_base64(bucket_name, file)
         pdf_display = f'<iframe src="data:application/pdf;base64,{b64}" width="700" height="1000" type="application/pdf"></iframe>'
         st.markdown(pdf_display, unsafe_allow_html=True)
     except ClientError as e:
         st.error(f"Error downloading file: {e}")
     
-# S3 file management function
+# S3 file management function, reruns on its own when a file is deleted, viewed or uploaded
+@st.fragment
 def s3_file_management():
     logger.info(f"Execution Started :  {inspect.currentframe().f_code.co_name}")
     userName = authenticator.User.UserName
@@ -62,8 +86,7 @@ def s3_file_management():
     if bucket_name:
         # List files in the bucket
         try:
-            response = s3.list_objects_v2(Bucket=bucket_name, Prefix=userName)
-            files = [obj['Key'] for obj in response.get('Contents', [])]
+            files = list_user_files(bucket_name, userName)
         except ClientError as e:
             st.error(f"Error listing files: {e}")
             files = []
@@ -81,7 +104,8 @@ def s3_file_management():
                             try:
                                 s3.delete_object(Bucket=bucket_name, Key=file)
                                 st.success(f"File {file} deleted successfully!")
-                                st.rerun()
+                                list_user_files.clear()
+                                st.rerun(scope="fragment")
                             except ClientError as e:
                                 st.error(f"Error deleting file: {e}")
                     with col3:
@@ -118,7 +142,8 @@ def s3_file_management():
                                  )
                     st.success(f"File {uploaded_file.name} uploaded successfully!")
                     uploaded_file = None
-                    st.rerun()
+                    list_user_files.clear()
+                    st.rerun(scope="fragment")
                 except ClientError as e:
                     st.error(f"Error uploading file: {e}")
 
@@ -151,6 +176,7 @@ def check_ingestion_job_status(ingestion_job_id):
         st.error(f"Error checking ingestion job status: {e}")
         return None
 
+@st.fragment
 def sync_knowledge_base_job():
     logger.info(f"Execution Started :  {inspect.currentframe().f_code.co_name}")
     if st.button("Sync Knowledge Base", key="sync"):
@@ -164,6 +190,7 @@ def sync_knowledge_base_job():
                         status = check_ingestion_job_status(ingestion_job_id)
                         if status not in  ['IN_PROGRESS','STARTING','STOPPING']:
                             break
+                        time.sleep(5)
                     st.success(f"Sync Completed. Ingestion Job ID: {ingestion_job_id}")
                 else:
                     st.error("Failed to start sync.")
@@ -173,82 +200,71 @@ def sync_knowledge_base_job():
 
 ######## CHATBOT Functions #########
 
-def query_knowledge_base(query,sessionId=None):
+@st.cache_resource
+def get_account_id():
+    return boto3.client('sts').get_caller_identity()['Account']
+
+@st.cache_resource
+def get_model_core(knowledge_base_id, model_id):
+    # One shared client and core per knowledge base and model, reused across sessions and reruns
+    region = bedrock_agent_runtime.meta.region_name
+    account_id = get_account_id() if model_id.startswith(INFERENCE_PROFILE_PREFIXES) else ""
+    return RagCore(knowledge_base_id, model_arn_for(model_id, region, account_id), client=bedrock_agent_runtime)
+
+@st.cache_resource
+def get_resilient_rag(knowledge_base_id):
+    # One per knowledge base, so each model has a single circuit breaker and latency history
+    # whichever route uses it
+    return ResilientRagCore(get_model_core(knowledge_base_id, model_id))
+
+def get_rag_core(knowledge_base_id, route=None):
+    """Try the routed model first, then the alternates of its tier"""
+    routed_model_id = route.ModelId if route else model_id
+    alternates = alternate_model_ids["strong" if route and route.Tier == "strong" else "light"]
+    model_ids = [routed_model_id] + [m for m in alternates if m != routed_model_id]
+    return get_resilient_rag(knowledge_base_id).with_models(
+        [get_model_core(knowledge_base_id, m) for m in model_ids])
+
+def query_knowledge_base(query,sessionId=None,route=None):
     logger.info(f"Execution Started :  {inspect.currentframe().f_code.co_name}")
     try:
-        # Initialize the Bedrock Agent Runtime client
-        model_arn = f'arn:aws:bedrock:us-east-1::foundation-model/{model_id}'
-
-        # Call the retrieve_and_generate method
-        if sessionId:
-            response = bedrock_agent_runtime.retrieve_and_generate(
-                input={
-                    'text': query
-                },
-                sessionId=sessionId,
-                retrieveAndGenerateConfiguration={
-                    'type': 'KNOWLEDGE_BASE',
-                    'knowledgeBaseConfiguration': {
-                        'knowledgeBaseId': knowledge_base_id,
-                        'modelArn': model_arn,
-                        "retrievalConfiguration": { 
-                            "vectorSearchConfiguration": { 
-                                "filter": { 
-                                    "equals":{
-                                            "key": "user",
-                                            "value": authenticator.User.UserName
-                                    }
-                                },
-                            "numberOfResults": 5
-                            }
-                        }   
-                    },       
-                }
-            )
-        else:
-            response = bedrock_agent_runtime.retrieve_and_generate(
-                input={
-                    'text': query
-                },
-                retrieveAndGenerateConfiguration={
-                    'type': 'KNOWLEDGE_BASE',
-                    'knowledgeBaseConfiguration': {
-                        'knowledgeBaseId': knowledge_base_id,
-                        'modelArn': model_arn,
-                        "retrievalConfiguration": { 
-                            "vectorSearchConfiguration": { 
-                                "filter": { 
-                                    "equals":{
-                                            "key": "user",
-                                            "value": authenticator.User.UserName
-                                    }
-                                },
-                            "numberOfResults": 5
-                            }
-                        }   
-                    },       
+        rag = get_rag_core(knowledge_base_id, route)
+        result = rag.query(
+            query,
+            sessionId or "",
+            number_of_results=route.NumberOfResults if route else None,
+            search_type=route.SearchType if route else None,
+            # Only retrieve the documents uploaded by the logged in user
+            filter={
+                "equals":{
+                        "key": "user",
+                        "value": authenticator.User.UserName
                 }
-            )
-        # response = bedrock_agent_runtime.invoke_agent(**payload)
-        # Process the response
-        generated_text = response['output']['text']
-        sessionId = response['sessionId']
-
-        citations = None
-        # Return Citation if exist in response 
-        # add jmes query to get retrievedReferences from citations root list 
-        if 'citations' in response  :
-            citations = jmespath.search('citations[].retrievedReferences[].{Text:content.text, Reference:\
-                                        { document:metadata."x-amz-bedrock-kb-source-uri", page:metadata."x-amz-bedrock-kb-document-page-number"} }' \
-                                        ,response)
-        logger.info(f"Generated response: {response}")
-        return generated_text,sessionId,citations
-    except ClientError as e:
+            }
+        )
+        logger.info(f"Generated response: {result}")
+        return result.answer,result.session_id,result.citations
+    # BotoCoreError covers connection errors and timeouts, also from the retrieval-only fallback
+    except (ClientError, BotoCoreError) as e:
         logger.error (f"Error querying knowledge base: {e}")
         st.error(f"Error querying knowledge base: {e}")
         
         return None
 
+def routed_query_knowledge_base(query,sessionId=None):
+    """Route the query to a model tier and retrieval settings, escalating once on a low-confidence answer"""
+    logger.info(f"Execution Started :  {inspect.currentframe().f_code.co_name}")
+    route = router.route_query(query, model_id, history_turns=len(st.session_state.get('chat_history', [])) // 2)
+
+    # Every attempt starts from the caller's session, not one written by an earlier attempt
+    result = router.answer_with_escalation(
+        query, route, lambda route: query_knowledge_base(query, sessionId=sessionId, route=route))
+    if result is None:
+        return None, sessionId, None, route
+    return result
+
+# Chat panel, a new message reruns only this panel
+@st.fragment
 def chatbot_interface():
     logger.info(f"Execution Started :  {inspect.currentframe().f_code.co_name}")
     # Initialize session state for chat history
@@ -257,32 +273,38 @@ def chatbot_interface():
 
     container = st.container(border=True)
    
-    # Chat interface
-    user_input = st.chat_input("Ask a question:")
+    # Chat interface, placed inline below the history since fragments cannot write to the page bottom
+    with st.container():
+        user_input = st.chat_input("Ask a question:")
     if user_input: 
         if user_input and knowledge_base_id:
             with st.spinner("Thinking..."):
                 
-                response,sessionId,citations = query_knowledge_base(user_input, sessionId=st.session_state.get("sessionId", None))
+                response,sessionId,citations,route = routed_query_knowledge_base(user_input, sessionId=st.session_state.get("sessionId", None))
 
-                # Store the SessionId if not stored 
-                if "sessionId" not in st.session_state:
-                    st.session_state.sessionId = sessionId
+                # The error is already shown, keep the failed turn out of the history
+                if response is not None:
+                    # Store the SessionId if not stored, a retrieval-only fallback answer has none
+                    if not st.session_state.get("sessionId"):
+                        st.session_state.sessionId = sessionId
 
-                # Append current interactions in chat_history 
-                st.session_state.chat_history.append({"user":user_input})
-                st.session_state.chat_history.append({"assistant":response,'citations':citations}) 
+                    # Append current interactions in chat_history 
+                    st.session_state.chat_history.append({"user":user_input})
+                    st.session_state.chat_history.append({"assistant":response,'citations':citations or [],'route':f"{route.ModelId} · {route.SearchType.lower()} · top {route.NumberOfResults}"}) 
         else:
             st.warning("Please enter a question and ensure a Knowledge Base ID under **Parameter** is provided.")
     
     # Display chat history
     for message in st.session_state.chat_history:
-        with st.chat_message(list(message.keys())[0],avatar=":material/person:" if list(message.keys())[0]=="user" else ":material/robot_2:"):
+        with container.chat_message(list(message.keys())[0],avatar=":material/person:" if list(message.keys())[0]=="user" else ":material/robot_2:"):
             st.text(list(message.values())[0]) 
-            if 'citations' in message and len(message['citations'])>0:
+            if 'route' in message:
+                st.caption(message['route'])
+            if message.get('citations'):
                 with st.expander("Sources", expanded=False):
                     st.json(message['citations'])     
 
+@st.fragment
 def kb_parametersettings():
     with st.expander("Parameters", expanded=False):
         knowledge_base_id_local = st.text_input("Knowledge Base ID", value= knowledge_base_id)
@@ -299,7 +321,8 @@ def kb_parametersettings():
         # Remove the session id if parameter updated
         if 'sessionId' in  st.session_state:
             del st.session_state['sessionId']
-        st.rerun()
+        # Parameters are used by every panel, so rerun the whole application
+        st.rerun(scope="app")
 
 # Main app
 def main():
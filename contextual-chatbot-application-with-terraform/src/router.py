@@ -0,0 +1,171 @@
+from typing import Callable, List, Optional, Tuple
+import json
+import logging
+import os
+import re
+import time
+
+from pydantic import BaseModel, Field
+
+## Create Logger
+logger = logging.getLogger(__name__)
+logger.setLevel(os.getenv("LOG_LEVEL","INFO"))
+
+# Stronger model used for hard questions and as fallback on low-confidence answers
+STRONG_MODEL_ID = os.getenv("StrongModelId", "amazon.nova-pro-v1:0")
+
+# Approximate on-demand price in USD per 1K tokens (input, output), used for cost logging only
+MODEL_PRICING = {
+    "amazon.nova-micro-v1:0": (0.000035, 0.00014),
+    "amazon.nova-lite-v1:0": (0.00006, 0.00024),
+    "amazon.nova-pro-v1:0": (0.0008, 0.0032),
+}
+
+# Whole-word patterns, so "how" does not match "show" and "it" does not match "Italy"
+LOOKUP_PREFIX = re.compile(r"(?:who|what|when|where|which|define|list|name)\b")
+# Stems take any suffix, so "differences", "comparing" and "explains" still count
+ANALYTICAL_KEYWORDS = re.compile(r"\b(?:why|how|compar\w*|differen\w*|explain\w*|summari[sz]\w*|"
+                                 r"analy[sz]\w*|evaluat\w*|pros and cons|impacts?|trade-offs?)\b")
+FOLLOWUP_PREFIX = re.compile(r"(?:it|that|this|they|those|these|and|also|what about|how about)\b")
+
+# Phrases Bedrock returns when the retrieved passages did not answer the question
+NO_ANSWER_PHRASES = ("sorry, i am unable to assist", "i could not find", "i don't have enough information",
+                     "does not contain information", "no relevant information")
+
+
+class RouteDecision(BaseModel):
+    Intent: str = Field(..., description="lookup, analytical, followup or general")
+    ModelId: str = Field(..., description="Bedrock model used for generation")
+    Tier: str = Field(..., description="light or strong")
+    NumberOfResults: int = Field(..., ge=1, le=100)
+    SearchType: str = Field(..., description="SEMANTIC or HYBRID")
+    Reasons: List[str] = Field(default_factory=list)
+
+
+def classify_intent(query: str, history_turns: int = 0) -> str:
+    """Classify the query intent with cheap keyword rules"""
+    text = query.strip().lower()
+    words = len(text.split())
+
+    if history_turns and (words <= 4 or FOLLOWUP_PREFIX.match(text)):
+        return "followup"
+    if ANALYTICAL_KEYWORDS.search(text):
+        return "analytical"
+    if LOOKUP_PREFIX.match(text) and words <= 12:
+        return "lookup"
+    return "general"
+
+
+def route_query(query: str, light_model_id: str, history_turns: int = 0) -> RouteDecision:
+    """Pick model tier, number of retrieved passages and search type for a query"""
+    intent = classify_intent(query, history_turns)
+    words = len(query.split())
+    reasons = [f"intent={intent}", f"words={words}"]
+
+    tier = "light"
+    number_of_results = 5
+    if intent == "lookup":
+        number_of_results = 3
+    elif intent == "analytical":
+        tier = "strong"
+        number_of_results = 10
+    elif intent == "followup":
+        # The session carries the conversation, a few fresh passages are enough
+        number_of_results = 4
+
+    if words > 40:
+        tier = "strong"
+        number_of_results = max(number_of_results, 10)
+        reasons.append("long query")
+
+    # Exact tokens (quoted phrases, codes, numbers, acronyms) benefit from keyword matching
+    search_type = "SEMANTIC"
+    if re.search(r'"[^"]+"|\b[A-Z]{2,}\b|\b\w*\d\w*\b', query):
+        search_type = "HYBRID"
+        reasons.append("exact terms")
+
+    return RouteDecision(
+        Intent=intent,
+        ModelId=STRONG_MODEL_ID if tier == "strong" else light_model_id,
+        Tier=tier,
+        NumberOfResults=number_of_results,
+        SearchType=search_type,
+        Reasons=reasons
+    )
+
+
+def escalate(decision: RouteDecision) -> Optional[RouteDecision]:
+    """Return a stronger route for a retry, or None if the decision is already on the strong tier"""
+    if decision.Tier == "strong":
+        return None
+    return RouteDecision(
+        Intent=decision.Intent,
+        ModelId=STRONG_MODEL_ID,
+        Tier="strong",
+        NumberOfResults=max(decision.NumberOfResults * 2, 10),
+        SearchType="HYBRID",
+        Reasons=decision.Reasons + ["low confidence fallback"]
+    )
+
+
+def is_low_confidence(answer: Optional[str]) -> bool:
+    """An answer is low confidence when it is empty or a refusal.
+    Missing citations alone do not count, greetings and small talk have none."""
+    if not answer or not answer.strip():
+        return True
+    text = answer.strip().lower()
+    return any(phrase in text for phrase in NO_ANSWER_PHRASES)
+
+
+def estimate_cost(model_id: str, query: str, answer: Optional[str], citations: Optional[list]) -> float:
+    """Rough cost estimate in USD using ~4 characters per token"""
+    input_price, output_price = MODEL_PRICING.get(model_id.split("/")[-1].removeprefix("us."), (0.0, 0.0))
+    context_chars = sum(len(c.get("text") or "") for c in citations or [])
+    input_tokens = (len(query) + context_chars) / 4
+    output_tokens = len(answer or "") / 4
+    return round(input_tokens / 1000 * input_price + output_tokens / 1000 * output_price, 6)
+
+
+def log_route(decision: RouteDecision, latency_ms: float, cost_usd: float, low_confidence: bool) -> None:
+    """Write one structured log line per generation attempt"""
+    logger.info("route_decision " + json.dumps({
+        **decision.model_dump(),
+        "LatencyMs": round(latency_ms, 1),
+        "EstimatedCostUsd": cost_usd,
+        "LowConfidence": low_confidence
+    }))
+
+
+# ask(route) returns (answer, session_id, citations), or None when the call failed
+Answer = Tuple[str, str, list]
+
+
+def answer_with_escalation(query: str, route: RouteDecision,
+                           ask: Callable[[RouteDecision], Optional[Answer]]) -> Optional[Tuple[str, str, list, RouteDecision]]:
+    """Answer on the routed tier and retry once on the strong tier when the answer is low confidence.
+    Returns (answer, session_id, citations, route), or None when the first attempt failed."""
+
+    def attempt(route):
+        start = time.perf_counter()
+        result = ask(route)
+        latency_ms = (time.perf_counter() - start) * 1000
+        if result is None:
+            return None
+        generated_text, new_session_id, citations = result
+        low_confidence = is_low_confidence(generated_text)
+        log_route(route, latency_ms, estimate_cost(route.ModelId, query, generated_text, citations), low_confidence)
+        return generated_text, new_session_id, citations, low_confidence
+
+    result = attempt(route)
+    if result is None:
+        return None
+    generated_text, session_id, citations, low_confidence = result
+
+    # Retry once on the strong tier when the light model could not answer from the passages
+    stronger_route = escalate(route) if low_confidence else None
+    if stronger_route:
+        retry = attempt(stronger_route)
+        if retry is not None:
+            generated_text, session_id, citations, _ = retry
+            route = stronger_route
+    return generated_text, session_id, citations, route
@@ -247,6 +247,18 @@ resource "aws_ecs_task_definition" "my_task" {
         {
           name  = "KnowledgeBaseId"
           value = aws_cloudformation_stack.kb-stack.outputs.KnowledgeBaseId
+        },
+        {
+          name  = "StrongModelId"
+          value = var.strong_model_id
+        },
+        {
+          name  = "AlternateModelIds"
+          value = var.alternate_model_ids
+        },
+        {
+          name  = "StrongAlternateModelIds"
+          value = var.strong_alternate_model_ids
         }
       ]
 
@@ -481,7 +493,9 @@ resource "null_resource" "docker_build_push" {
   provisioner "local-exec" {
     command = <<-EOT
       # Build Docker image
-      docker buildx build --platform linux/amd64 -t ${aws_ecr_repository.app_repo.repository_url}:${var.image_tag} .././src/ 
+      docker buildx build --platform linux/amd64 \
+        --build-context rag_core=../../contextual-chatbot-with-aws-hosted-interface/streamlit-serverless/streamlit_serverless_app/streamlit_sample/rag_core \
+        -t ${aws_ecr_repository.app_repo.repository_url}:${var.image_tag} .././src/ 
 
       # Authenticate Docker to ECR
       aws ecr get-login-password --region ${var.aws_region} | docker login --username AWS --password-stdin ${aws_ecr_repository.app_repo.repository_url}
@@ -6,4 +6,19 @@ variable "image_tag" {
   description = "Docker image tag to deploy"
   type        = string
   default = "1"
+}
+variable "strong_model_id" {
+  description = "Bedrock model used for complex questions and low-confidence fallback"
+  type        = string
+  default     = "amazon.nova-pro-v1:0"
+}
+variable "alternate_model_ids" {
+  description = "Comma-separated Bedrock models tried when a light-tier model is slow, throttled or failing"
+  type        = string
+  default     = "amazon.nova-micro-v1:0"
+}
+variable "strong_alternate_model_ids" {
+  description = "Comma-separated Bedrock models tried when the strong model is slow, throttled or failing"
+  type        = string
+  default     = "us.amazon.nova-pro-v1:0"
 }
\ No newline at end of file
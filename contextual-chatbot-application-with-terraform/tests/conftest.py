@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The application modules live in src, next to the Dockerfile that ships them
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
@@ -0,0 +1,131 @@
+import pytest
+
+import router
+
+LIGHT_MODEL_ID = "amazon.nova-lite-v1:0"
+
+
+@pytest.mark.parametrize("query, history_turns, intent", [
+    ("What is the refund policy?", 0, "lookup"),
+    ("Who approved the budget", 0, "lookup"),
+    ("Show me the invoice for March", 0, "general"),
+    ("How does the approval workflow work?", 0, "analytical"),
+    ("What are the differences between plan A and plan B?", 0, "analytical"),
+    ("Comparing the two contracts, which one is cheaper?", 0, "analytical"),
+    ("Which section explains the termination clause?", 0, "analytical"),
+    ("What impacts the delivery date?", 0, "analytical"),
+    ("Italy office opening hours and holiday schedule for staff", 3, "general"),
+    ("It says thirty days, is that right for every product line?", 3, "followup"),
+    ("and for Canada?", 3, "followup"),
+    ("and for Canada?", 0, "general"),
+])
+def test_classify_intent(query, history_turns, intent):
+    assert router.classify_intent(query, history_turns) == intent
+
+
+def test_route_lookup_uses_light_model_and_few_passages():
+    decision = router.route_query("What is the refund policy?", LIGHT_MODEL_ID)
+    assert (decision.ModelId, decision.Tier, decision.NumberOfResults, decision.SearchType) == (
+        LIGHT_MODEL_ID, "light", 3, "SEMANTIC")
+
+
+def test_route_analytical_uses_strong_model():
+    decision = router.route_query("Explain the differences between the two plans", LIGHT_MODEL_ID)
+    assert (decision.ModelId, decision.Tier, decision.NumberOfResults) == (router.STRONG_MODEL_ID, "strong", 10)
+
+
+def test_route_long_query_uses_strong_model():
+    decision = router.route_query(" ".join(["word"] * 41), LIGHT_MODEL_ID)
+    assert decision.Tier == "strong"
+    assert "long query" in decision.Reasons
+
+
+@pytest.mark.parametrize("query", ['Find "late fee" in the contract', "Status of PO 4411", "What does SLA mean"])
+def test_route_exact_terms_use_hybrid_search(query):
+    assert router.route_query(query, LIGHT_MODEL_ID).SearchType == "HYBRID"
+
+
+def test_escalate_light_route():
+    decision = router.route_query("What is the refund policy?", LIGHT_MODEL_ID)
+    stronger = router.escalate(decision)
+    assert (stronger.ModelId, stronger.Tier, stronger.NumberOfResults, stronger.SearchType) == (
+        router.STRONG_MODEL_ID, "strong", 10, "HYBRID")
+    assert stronger.Reasons[-1] == "low confidence fallback"
+
+
+def test_escalate_strong_route_returns_none():
+    assert router.escalate(router.route_query("Why did sales drop?", LIGHT_MODEL_ID)) is None
+
+
+@pytest.mark.parametrize("answer, low", [
+    (None, True),
+    ("   ", True),
+    ("Sorry, I am unable to assist you with this request.", True),
+    ("The document does not contain information about pricing.", True),
+    ("Hello! How can I help you today?", False),
+    ("Refunds are accepted within 30 days.", False),
+])
+def test_is_low_confidence(answer, low):
+    assert router.is_low_confidence(answer) is low
+
+
+def test_estimate_cost():
+    citations = [{"text": "x" * 4000}, {"text": None}]
+    # (4 + 4000) / 4 input tokens and 4000 / 4 output tokens at Nova Lite prices
+    assert router.estimate_cost(LIGHT_MODEL_ID, "abcd", "y" * 4000, citations) == 0.000300
+    assert router.estimate_cost("unknown-model", "abcd", "answer", citations) == 0.0
+
+
+def test_log_route_does_not_use_deprecated_pydantic_api(recwarn):
+    router.log_route(router.route_query("What is the refund policy?", LIGHT_MODEL_ID), 12.3, 0.0001, False)
+    assert not [w for w in recwarn if "deprecated" in str(w.message).lower()]
+
+
+class Ask:
+    """Stand-in for query_knowledge_base that answers per model id and records the routes it was called with"""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.routes = []
+
+    def __call__(self, route):
+        self.routes.append(route)
+        return self.answers.get(route.ModelId)
+
+
+def test_confident_answer_is_not_escalated():
+    route = router.route_query("What is the refund policy?", LIGHT_MODEL_ID)
+    ask = Ask({LIGHT_MODEL_ID: ("Refunds are accepted within 30 days.", "session-1", [{"text": "p"}])})
+
+    answer, session_id, citations, used_route = router.answer_with_escalation("What is the refund policy?", route, ask)
+
+    assert (answer, session_id, citations) == ("Refunds are accepted within 30 days.", "session-1", [{"text": "p"}])
+    assert used_route is route
+    assert len(ask.routes) == 1
+
+
+def test_low_confidence_answer_is_escalated_once():
+    route = router.route_query("What is the refund policy?", LIGHT_MODEL_ID)
+    ask = Ask({
+        LIGHT_MODEL_ID: ("Sorry, I am unable to assist you with this request.", "session-light", []),
+        router.STRONG_MODEL_ID: ("Refunds are accepted within 30 days.", "session-strong", [{"text": "p"}]),
+    })
+
+    answer, session_id, _, used_route = router.answer_with_escalation("What is the refund policy?", route, ask)
+
+    assert (answer, session_id, used_route.Tier) == ("Refunds are accepted within 30 days.", "session-strong", "strong")
+    assert [r.ModelId for r in ask.routes] == [LIGHT_MODEL_ID, router.STRONG_MODEL_ID]
+
+
+def test_failed_escalation_keeps_first_answer():
+    route = router.route_query("What is the refund policy?", LIGHT_MODEL_ID)
+    ask = Ask({LIGHT_MODEL_ID: ("", "session-light", [])})
+
+    answer, session_id, _, used_route = router.answer_with_escalation("What is the refund policy?", route, ask)
+
+    assert (answer, session_id, used_route) == ("", "session-light", route)
+
+
+def test_failed_first_attempt_returns_none():
+    route = router.route_query("What is the refund policy?", LIGHT_MODEL_ID)
+    assert router.answer_with_escalation("What is the refund policy?", route, Ask({})) is None
@@ -11,7 +11,10 @@ app_env_vars = {
     "STREAMLIT_SERVER_PORT": "8501"
 }
 
+# Task size, architecture, scaling and stickiness settings (see "frontend" in cdk.json)
+frontend_config = app.node.try_get_context("frontend") or {}
+
 # Create the front-end Stack
-frontend_stack = FrontendStack(app, f"{APP_PREFIX}-FrontendStack")
+frontend_stack = FrontendStack(app, f"{APP_PREFIX}-FrontendStack", **frontend_config)
 
 app.synth()
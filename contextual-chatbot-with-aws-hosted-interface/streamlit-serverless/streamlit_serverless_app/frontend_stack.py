@@ -10,6 +10,7 @@ from aws_cdk import (
     aws_ecs as ecs,
     aws_cloudfront as cloudfront,
     aws_cloudfront_origins as origins,
+    aws_cloudwatch as cloudwatch,
     aws_elasticloadbalancingv2 as elbv2
 )
 
@@ -18,15 +19,33 @@ from aws_cdk.aws_ecr_assets import DockerImageAsset
 class FrontendStack(Stack):
     """Frontend stack for hosting Streamlit with ECS and Fargate"""
 
-    def __init__(self, scope: Construct, construct_id: str) -> None:
+    def __init__(self, scope: Construct, construct_id: str,
+                 cpu_architecture: str = None,
+                 task_cpu: int = 512,
+                 task_memory_mib: int = 1024,
+                 min_capacity: int = 1,
+                 max_capacity: int = 4,
+                 target_cpu_utilization: int = 60,
+                 target_sessions_per_task: int = 20,
+                 stickiness_duration_hours: int = 12,
+                 deregistration_delay_seconds: int = 300,
+                 rag_mode: str = "inprocess",
+                 alternate_model_ids: str = "") -> None:
         super().__init__(scope, construct_id)
 
         platform_mapping = {
             "x86_64": ecs.CpuArchitecture.X86_64,
-            "arm64": ecs.CpuArchitecture.ARM64
+            "amd64": ecs.CpuArchitecture.X86_64,
+            "arm64": ecs.CpuArchitecture.ARM64,
+            "aarch64": ecs.CpuArchitecture.ARM64
         }
-        # Get architecture from platform (depending the machine that runs CDK)
-        architecture = platform_mapping[platform.machine()] 
+        # Get architecture from context, or from platform (depending the machine that runs CDK).
+        # The image is built locally, so a cross-architecture value also needs a matching Docker buildx setup.
+        architecture = platform_mapping[(cpu_architecture or platform.machine()).lower()]
+
+        # Namespace and dimension of the active sessions metric published by the Streamlit tasks
+        metrics_namespace = "StreamlitServerlessApp"
+        metrics_dimension = {"AppName": self.stack_name}
 
         # The code that defines your stack goes here
         # Build Docker image
@@ -47,11 +66,33 @@ class FrontendStack(Stack):
                     "ecr:BatchGetImage",
                     "logs:CreateLogStream",
                     "logs:PutLogEvents",
-                    "lambda:InvokeFunction"
+                    "lambda:InvokeFunction",
+                    "lambda:GetFunctionConfiguration"
                 ],
                 resources=["*"]
             )  
         )
+        # allow the app to query the knowledge base in-process
+        app_execute_role.add_to_policy(
+            iam.PolicyStatement(
+                actions=[
+                    "bedrock:InvokeModel",
+                    "bedrock:InvokeModelWithResponseStream",
+                    "bedrock:Retrieve",
+                    "bedrock:RetrieveAndGenerate",
+                    "bedrock:GetInferenceProfile"
+                ],
+                resources=["*"]
+            )
+        )
+        # allow the app to publish its active sessions metric
+        app_execute_role.add_to_policy(
+            iam.PolicyStatement(
+                actions=["cloudwatch:PutMetricData"],
+                resources=["*"],
+                conditions={"StringEquals": {"cloudwatch:namespace": metrics_namespace}}
+            )
+        )
         # create VPC to host the Ecs app
         vpc = ec2.Vpc(self, "StreamlitECSVpc", 
                       ip_addresses=ec2.IpAddresses.cidr("10.194.0.0/16"),
@@ -65,6 +106,9 @@ class FrontendStack(Stack):
                                   vpc=vpc)
         fargate_service = ecs_patterns.ApplicationLoadBalancedFargateService(self, "StreamlitAppService",
                         cluster=ecs_cluster,
+                        cpu=task_cpu,
+                        memory_limit_mib=task_memory_mib,
+                        desired_count=min_capacity,
                         runtime_platform = ecs.RuntimePlatform(
                             operating_system_family=ecs.OperatingSystemFamily.LINUX,
                             cpu_architecture=architecture),
@@ -72,6 +116,12 @@ class FrontendStack(Stack):
                             image=ecs.ContainerImage.from_docker_image_asset(imageAsset),
                             container_port=8501,
                             task_role=app_execute_role,
+                            environment={
+                                "METRICS_NAMESPACE": metrics_namespace,
+                                "METRICS_APP_NAME": metrics_dimension["AppName"],
+                                "RAG_MODE": rag_mode,
+                                "ALTERNATE_MODEL_IDS": alternate_model_ids
+                            }
                         ), 
                         task_subnets=ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS),
                         public_load_balancer=True,
@@ -81,6 +131,41 @@ class FrontendStack(Stack):
         fargate_service.target_group.configure_health_check(
             path="/healthz"
         )
+
+        # Streamlit keeps session state in task memory behind a websocket,
+        # so pin each browser to the task that holds its session
+        fargate_service.target_group.enable_cookie_stickiness(
+            cdk.Duration.hours(stickiness_duration_hours)
+        )
+        # Give open websockets time to finish on scale-in and deployments
+        fargate_service.target_group.set_attribute(
+            "deregistration_delay.timeout_seconds", str(deregistration_delay_seconds)
+        )
+
+        # Scale out on CPU and on active sessions per task, scale in conservatively
+        scalable_target = fargate_service.service.auto_scale_task_count(
+            min_capacity=min_capacity,
+            max_capacity=max_capacity
+        )
+        scalable_target.scale_on_cpu_utilization("StreamlitCpuScaling",
+            target_utilization_percent=target_cpu_utilization,
+            scale_in_cooldown=cdk.Duration.seconds(deregistration_delay_seconds),
+            scale_out_cooldown=cdk.Duration.seconds(60)
+        )
+        # Each task publishes its own count, so the average is sessions per task
+        active_sessions_metric = cloudwatch.Metric(
+            namespace=metrics_namespace,
+            metric_name="ActiveSessions",
+            dimensions_map=metrics_dimension,
+            statistic="Average",
+            period=cdk.Duration.minutes(1)
+        )
+        scalable_target.scale_to_track_custom_metric("StreamlitSessionScaling",
+            metric=active_sessions_metric,
+            target_value=target_sessions_per_task,
+            scale_in_cooldown=cdk.Duration.seconds(deregistration_delay_seconds),
+            scale_out_cooldown=cdk.Duration.seconds(60)
+        )
         cdk.CfnOutput(
             self,
             'StreamlitLoadbalancer',
@@ -90,16 +175,42 @@ class FrontendStack(Stack):
         custom_header_name = "X-Verify-Origin"
         custom_header_value = '-'.join((self.stack_name,"StreamLitCloudFrontDistribution"))
         
+        streamlit_origin = origins.LoadBalancerV2Origin(fargate_service.load_balancer, 
+            protocol_policy=cloudfront.OriginProtocolPolicy.HTTP_ONLY, 
+            http_port=80, 
+            origin_path="/", 
+            custom_headers = { custom_header_name : custom_header_value } )
+
+        # Streamlit's JS/CSS bundles under /static are content-hashed, so they can be
+        # cached at the edge for a long time and served compressed
+        static_assets_cache_policy = cloudfront.CachePolicy(self, "StreamlitStaticAssetsCachePolicy",
+            comment="Long-lived cache for immutable Streamlit static assets",
+            default_ttl=cdk.Duration.days(30),
+            min_ttl=cdk.Duration.days(1),
+            max_ttl=cdk.Duration.days(365),
+            cookie_behavior=cloudfront.CacheCookieBehavior.none(),
+            header_behavior=cloudfront.CacheHeaderBehavior.none(),
+            query_string_behavior=cloudfront.CacheQueryStringBehavior.none(),
+            enable_accept_encoding_gzip=True,
+            enable_accept_encoding_brotli=True
+        )
+        static_assets_behavior = cloudfront.BehaviorOptions(
+            origin=streamlit_origin,
+            viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+            allowed_methods=cloudfront.AllowedMethods.ALLOW_GET_HEAD_OPTIONS,
+            cached_methods=cloudfront.CachedMethods.CACHE_GET_HEAD_OPTIONS,
+            cache_policy=static_assets_cache_policy,
+            response_headers_policy=cloudfront.ResponseHeadersPolicy.CORS_ALLOW_ALL_ORIGINS,
+            compress=True
+        )
+
         # Create a CloudFront distribution
+        # The default behavior stays pass-through for the websocket (/_stcore/stream) and dynamic routes
         cloudfront_distribution = cloudfront.Distribution(self, "StreamLitCloudFrontDistribution",
             minimum_protocol_version=cloudfront.SecurityPolicyProtocol.SSL_V3,
             comment="CloudFront distribution for Streamlit frontend application",
             default_behavior=cloudfront.BehaviorOptions(
-                origin=origins.LoadBalancerV2Origin(fargate_service.load_balancer, 
-                    protocol_policy=cloudfront.OriginProtocolPolicy.HTTP_ONLY, 
-                    http_port=80, 
-                    origin_path="/", 
-                    custom_headers = { custom_header_name : custom_header_value } ),
+                origin=streamlit_origin,
                 viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
                 allowed_methods=cloudfront.AllowedMethods.ALLOW_ALL,
                 cache_policy=cloudfront.CachePolicy.CACHING_DISABLED,
@@ -107,6 +218,10 @@ class FrontendStack(Stack):
                 response_headers_policy=cloudfront.ResponseHeadersPolicy.CORS_ALLOW_ALL_ORIGINS,
                 compress=False
             ),
+            additional_behaviors={
+                "/static/*": static_assets_behavior,
+                "/favicon.png": static_assets_behavior
+            },
         )
 
         # Output the CloudFront distribution URL
@@ -0,0 +1,6 @@
+"""Shared retrieve-and-generate core for the Streamlit app and the Lambda handler"""
+from rag_core.core import RagAnswer, RagCore, RagStream, model_arn_for
+from rag_core.resilience import CircuitBreaker, GuardedStream, LatencyTracker, ResilientRagCore
+
+__all__ = ["RagAnswer", "RagCore", "RagStream", "model_arn_for",
+           "CircuitBreaker", "GuardedStream", "LatencyTracker", "ResilientRagCore"]
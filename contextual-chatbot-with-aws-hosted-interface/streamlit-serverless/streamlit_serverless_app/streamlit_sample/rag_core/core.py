@@ -0,0 +1,181 @@
+"""Retrieve-and-generate against an Amazon Bedrock Knowledge Base"""
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+
+import boto3
+from botocore.config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_ID = "us.amazon.nova-lite-v1:0"
+DEFAULT_FUNCTION_NAME = "InvokeKnowledgeBase"
+# Cross-region inference profile ids start with a geography prefix
+INFERENCE_PROFILE_PREFIXES = ("us.", "eu.", "apac.")
+# Fail fast instead of waiting for the default botocore timeouts; callers decide how to recover
+CLIENT_CONFIG = Config(connect_timeout=5, read_timeout=30, retries={"max_attempts": 2, "mode": "standard"})
+
+
+@dataclass
+class RagAnswer:
+    """Answer to one question, with the Bedrock session to continue the conversation"""
+    question: str
+    answer: str
+    session_id: str
+    citations: list = field(default_factory=list)
+
+
+class RagStream:
+    """Iterate over generated text chunks; session_id and answer are set once the stream is consumed"""
+
+    def __init__(self, question, response):
+        self.question = question
+        self.session_id = response.get("sessionId", "")
+        self.citations = []
+        self._chunks = []
+        self._events = response["stream"]
+
+    def __iter__(self):
+        for event in self._events:
+            if "output" in event:
+                text = event["output"]["text"]
+                self._chunks.append(text)
+                yield text
+            elif "citation" in event:
+                citation = event["citation"].get("citation", event["citation"])
+                self.citations.extend(_references(citation.get("retrievedReferences", [])))
+
+    @property
+    def answer(self):
+        return "".join(self._chunks)
+
+    def close(self):
+        """Release the HTTP connection of a stream that will not be consumed"""
+        close = getattr(self._events, "close", None)
+        if close:
+            close()
+
+
+def _references(references):
+    return [
+        {
+            "text": reference.get("content", {}).get("text", ""),
+            "uri": reference.get("location", {}).get("s3Location", {}).get("uri", ""),
+            "page": reference.get("metadata", {}).get("x-amz-bedrock-kb-document-page-number")
+        }
+        for reference in references
+    ]
+
+
+def model_arn_for(model_id, region, account_id):
+    """Build the ARN of a foundation model or cross-region inference profile"""
+    if model_id.startswith("arn:"):
+        return model_id
+    if model_id.startswith(INFERENCE_PROFILE_PREFIXES):
+        return f"arn:aws:bedrock:{region}:{account_id}:inference-profile/{model_id}"
+    return f"arn:aws:bedrock:{region}::foundation-model/{model_id}"
+
+
+class RagCore:
+    """In-process RAG API shared by the Lambda handler and the Streamlit app"""
+
+    def __init__(self, knowledge_base_id, model_arn, client=None, number_of_results=5):
+        if not knowledge_base_id:
+            raise ValueError("knowledge_base_id is required")
+        self.knowledge_base_id = knowledge_base_id
+        self.model_arn = model_arn
+        self.number_of_results = number_of_results
+        self.client = client or boto3.client("bedrock-agent-runtime")
+
+    @classmethod
+    def from_environment(cls, session=None):
+        """Create from KNOWLEDGE_BASE_ID and MODEL_ID, falling back to the settings of the InvokeKnowledgeBase Lambda"""
+        session = session or boto3.session.Session()
+        knowledge_base_id = os.environ.get("KNOWLEDGE_BASE_ID")
+        model_id = os.environ.get("MODEL_ID")
+        if not knowledge_base_id:
+            # One control-plane call at startup, so the app needs no extra deployment parameters
+            function_name = os.environ.get("RAG_LAMBDA_FUNCTION", DEFAULT_FUNCTION_NAME)
+            configuration = session.client("lambda").get_function_configuration(FunctionName=function_name)
+            variables = configuration.get("Environment", {}).get("Variables", {})
+            knowledge_base_id = variables.get("KNOWLEDGE_BASE_ID")
+            model_id = model_id or variables.get("MODEL_ID")
+        model_id = model_id or DEFAULT_MODEL_ID
+        account_id = session.client("sts").get_caller_identity()["Account"]
+        return cls(
+            knowledge_base_id,
+            model_arn_for(model_id, session.region_name, account_id),
+            client=session.client("bedrock-agent-runtime", config=CLIENT_CONFIG)
+        )
+
+    def with_model(self, model_arn):
+        """Same knowledge base and client, different generation model"""
+        return RagCore(self.knowledge_base_id, model_arn, client=self.client,
+                       number_of_results=self.number_of_results)
+
+    def _vector_search_configuration(self, number_of_results=None, search_type=None, filter=None):
+        """Per-call retrieval overrides on top of the instance defaults"""
+        configuration = {"numberOfResults": number_of_results or self.number_of_results}
+        if search_type:
+            configuration["overrideSearchType"] = search_type
+        if filter:
+            configuration["filter"] = filter
+        return configuration
+
+    def _request(self, question, session_id, **retrieval):
+        request = {
+            "input": {"text": question},
+            "retrieveAndGenerateConfiguration": {
+                "type": "KNOWLEDGE_BASE",
+                "knowledgeBaseConfiguration": {
+                    "knowledgeBaseId": self.knowledge_base_id,
+                    "modelArn": self.model_arn,
+                    "retrievalConfiguration": {
+                        "vectorSearchConfiguration": self._vector_search_configuration(**retrieval)
+                    }
+                }
+            }
+        }
+        if session_id:
+            request["sessionId"] = session_id
+        return request
+
+    def retrieve(self, question, **retrieval):
+        """Return the passages for a question without generating an answer"""
+        response = self.client.retrieve(
+            knowledgeBaseId=self.knowledge_base_id,
+            retrievalQuery={"text": question},
+            retrievalConfiguration={
+                "vectorSearchConfiguration": self._vector_search_configuration(**retrieval)
+            }
+        )
+        return _references(response.get("retrievalResults", []))
+
+    def query(self, question, session_id="", **retrieval):
+        """Answer one question, continuing the Bedrock session if session_id is given.
+
+        retrieval accepts number_of_results, search_type (SEMANTIC or HYBRID) and a metadata filter,
+        overriding the instance defaults for this call only.
+        """
+        response = self.client.retrieve_and_generate(**self._request(question, session_id, **retrieval))
+        citations = []
+        for citation in response.get("citations", []):
+            citations.extend(_references(citation.get("retrievedReferences", [])))
+        return RagAnswer(
+            question=question.strip(),
+            answer=response["output"]["text"].strip(),
+            session_id=response["sessionId"],
+            citations=citations
+        )
+
+    def stream(self, question, session_id="", **retrieval):
+        """Answer one question, returning a RagStream of text chunks as they are generated"""
+        response = self.client.retrieve_and_generate_stream(**self._request(question, session_id, **retrieval))
+        return RagStream(question.strip(), response)
+
+    def batch(self, questions, max_workers=4, **retrieval):
+        """Answer independent questions concurrently, each in its own session, preserving order"""
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(partial(self.query, **retrieval), questions))
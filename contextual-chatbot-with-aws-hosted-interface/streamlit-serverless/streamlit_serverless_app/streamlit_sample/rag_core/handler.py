@@ -0,0 +1,59 @@
+"""Lambda handler for the optional Lambda deployment mode, same contract as the InvokeKnowledgeBase function"""
+import json
+import logging
+from botocore.exceptions import ClientError, BotoCoreError
+
+from rag_core.resilience import ResilientRagCore
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+HEADERS = {
+    "Content-Type": 'application/json',
+    "Access-Control-Allow-Methods": "GET, POST",
+    "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
+    "Access-Control-Allow-Origin": "*"
+}
+
+# Created once per execution environment
+rag = ResilientRagCore.from_environment()
+
+
+def _response(status_code, body):
+    return {
+        'statusCode': status_code,
+        'isBase64Encoded': False,
+        'headers': HEADERS,
+        'body': json.dumps(body)
+    }
+
+
+def lambda_handler(event, context):
+    try:
+        logger.info(f"Received event: {json.dumps(event)}")
+
+        # API Gateway proxy events carry the request as a JSON string
+        if 'body' in event:
+            event = json.loads(event['body'])
+
+        if "question" not in event or "sessionId" not in event:
+            raise ValueError("Missing required fields: 'question' or 'sessionId'")
+
+        result = rag.query(event["question"], event["sessionId"])
+        logger.info(f"Session ID: {result.session_id}")
+
+        return _response(200, {
+            "question": result.question,
+            "answer": result.answer,
+            "sessionId": result.session_id
+        })
+
+    except ValueError as e:
+        logger.error(f"Validation error: {str(e)}")
+        return _response(400, {"error": str(e)})
+    except (ClientError, BotoCoreError) as e:
+        logger.error(f"AWS service error: {str(e)}")
+        return _response(500, {"error": "Internal server error"})
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        return _response(500, {"error": "Internal server error"})
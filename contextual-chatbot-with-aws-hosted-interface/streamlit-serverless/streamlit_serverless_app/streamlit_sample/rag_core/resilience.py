@@ -0,0 +1,282 @@
+"""Hedged generation, per-model circuit breaking and retrieval-only fallback on top of RagCore"""
+import os
+import copy
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from functools import partial
+
+import boto3
+
+from rag_core.core import RagAnswer, RagCore, RagStream, model_arn_for
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """Rolling window of successful generation latencies, in seconds"""
+
+    def __init__(self, window=200, min_samples=20, default_delay=2.0):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def p95(self):
+        """95th percentile latency, or default_delay until enough samples are collected"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return self.default_delay
+            ordered = sorted(self._samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+
+class CircuitBreaker:
+    """Open after failure_threshold consecutive failures, let one trial call through after reset_timeout"""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                # Half-open: a single trial call decides whether to close again.
+                # Restart the clock so another trial is allowed if this one is never made.
+                self.state = self.HALF_OPEN
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class ResilientRagCore:
+    """RagCore with the same query/stream/batch API that stays answerable while Bedrock is throttled or degraded.
+
+    A generation call that has not returned after the p95 latency of its model is hedged with a
+    second request to the next model (inference profile) whose circuit breaker is closed. When every
+    breaker is open, or no candidate answers within the timeout, the answer falls back to the
+    retrieved passages without generation. Circuit breakers and latency history are kept per model
+    ARN and shared with every view created by with_models.
+    """
+
+    def __init__(self, primary, alternates=(), timeout=20.0, min_hedge_delay=0.5, max_hedge_delay=5.0,
+                 max_workers=16, failure_threshold=5, reset_timeout=30.0):
+        self.cores = [primary, *alternates]
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.timeout = timeout
+        self.min_hedge_delay = min_hedge_delay
+        # Cap the delay so hedging keeps working when a degradation pushes the p95 up
+        self.max_hedge_delay = max_hedge_delay
+        # Keyed by (method, model_arn): opening a stream returns much sooner than a full answer
+        self.latency = {}
+        self.breakers = {}
+        for core in self.cores:
+            self.breaker_for(core.model_arn)
+        # Not used as a context manager: a losing hedge keeps running in the background
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    @classmethod
+    def from_environment(cls, session=None):
+        """Create from RagCore.from_environment plus comma-separated ALTERNATE_MODEL_IDS"""
+        session = session or boto3.session.Session()
+        primary = RagCore.from_environment(session)
+        alternate_ids = [m.strip() for m in os.environ.get("ALTERNATE_MODEL_IDS", "").split(",") if m.strip()]
+        alternates = []
+        if alternate_ids:
+            account_id = session.client("sts").get_caller_identity()["Account"]
+            alternates = [
+                primary.with_model(model_arn_for(model_id, session.region_name, account_id))
+                for model_id in alternate_ids
+            ]
+        return cls(primary, alternates, timeout=float(os.environ.get("GENERATION_TIMEOUT_SECONDS", "20")))
+
+    @property
+    def primary(self):
+        return self.cores[0]
+
+    def breaker_for(self, model_arn):
+        breaker = self.breakers.get(model_arn)
+        if breaker is None:
+            # setdefault keeps the first breaker if two threads get here at once
+            breaker = self.breakers.setdefault(model_arn, CircuitBreaker(self.failure_threshold, self.reset_timeout))
+        return breaker
+
+    def latency_for(self, method, model_arn):
+        tracker = self.latency.get((method, model_arn))
+        if tracker is None:
+            tracker = self.latency.setdefault((method, model_arn), LatencyTracker())
+        return tracker
+
+    def with_models(self, cores):
+        """A view that tries cores in the given order and shares circuit breakers, latency history
+        and threads with this instance, so a model's failures count for every route that uses it"""
+        view = copy.copy(self)
+        view.cores = list(cores)
+        for core in view.cores:
+            self.breaker_for(core.model_arn)
+        return view
+
+    def _available(self):
+        return [core for core in self.cores if self.breaker_for(core.model_arn).allow()]
+
+    def _call(self, method, core, question, session_id, retrieval):
+        start = time.monotonic()
+        try:
+            result = getattr(core, method)(question, session_id, **retrieval)
+        except Exception:
+            self.breaker_for(core.model_arn).record_failure()
+            raise
+        self.breaker_for(core.model_arn).record_success()
+        self.latency_for(method, core.model_arn).record(time.monotonic() - start)
+        return core, result
+
+    def _hedged(self, method, question, session_id, retrieval):
+        """Return (core, result) of the first successful call of method, or None if no candidate answered in time.
+
+        Without a session a slow call is hedged with the next candidate. A Bedrock session must not
+        get two concurrent turns, so with a session the next candidate is only tried after a failure.
+        """
+        candidates = self._available()
+        if not candidates:
+            logger.warning("All circuit breakers open, answering from retrieval only")
+            return None
+
+        deadline = time.monotonic() + self.timeout
+        p95 = self.latency_for(method, candidates[0].model_arn).p95()
+        hedge_delay = min(max(p95, self.min_hedge_delay), self.max_hedge_delay)
+        pending = {self._executor.submit(self._call, method, candidates[0], question, session_id, retrieval)}
+        remaining = candidates[1:]
+        while pending:
+            hedge_on_slow = bool(remaining) and not session_id
+            wait_for = deadline - time.monotonic()
+            if hedge_on_slow:
+                wait_for = min(wait_for, hedge_delay)
+            done, pending = wait(pending, timeout=max(wait_for, 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    _discard(pending)
+                    return future.result()
+                logger.warning(f"Generation attempt failed: {future.exception()}")
+            if time.monotonic() >= deadline:
+                break
+            if remaining and (hedge_on_slow or not pending):
+                logger.info(f"Hedging generation to {remaining[0].model_arn}")
+                pending.add(self._executor.submit(self._call, method, remaining.pop(0), question, session_id, retrieval))
+        _discard(pending)
+        logger.warning("No generation within the timeout, answering from retrieval only")
+        return None
+
+    def retrieval_only(self, question, session_id="", **retrieval):
+        """Answer with the retrieved passages, without calling a model"""
+        citations = self.primary.retrieve(question, **retrieval)
+        if citations:
+            passages = "\n\n".join(f"- {c['text'].strip()}" for c in citations)
+            answer = ("The assistant is temporarily unable to generate an answer. "
+                      f"These passages from your documents may help:\n\n{passages}")
+        else:
+            answer = "The assistant is temporarily unable to answer. Please try again later."
+        return RagAnswer(question=question.strip(), answer=answer, session_id=session_id, citations=citations)
+
+    def query(self, question, session_id="", **retrieval):
+        winner = self._hedged("query", question, session_id, retrieval)
+        if winner is not None:
+            return winner[1]
+        return self.retrieval_only(question, session_id, **retrieval)
+
+    def stream(self, question, session_id="", **retrieval):
+        # Only the call that opens the stream is hedged; a failure while reading it is handled by GuardedStream
+        winner = self._hedged("stream", question, session_id, retrieval)
+        if winner is not None:
+            return GuardedStream(self, *winner, session_id, retrieval)
+        fallback = self.retrieval_only(question, session_id, **retrieval)
+        stream = RagStream(fallback.question, {
+            "sessionId": session_id,
+            "stream": iter([{"output": {"text": fallback.answer}}])
+        })
+        stream.citations = fallback.citations
+        return stream
+
+    def batch(self, questions, max_workers=4, **retrieval):
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(partial(self.query, **retrieval), questions))
+
+
+class GuardedStream:
+    """RagStream of the winning call. An error while reading it counts as a failure of that
+    model and the answer is finished with the retrieved passages."""
+
+    def __init__(self, owner, core, stream, session_id, retrieval):
+        self.question = stream.question
+        self.session_id = stream.session_id
+        self.citations = []
+        self._owner = owner
+        self._core = core
+        self._stream = stream
+        self._original_session_id = session_id
+        self._retrieval = retrieval
+        self._fallback_chunks = []
+
+    def __iter__(self):
+        try:
+            yield from self._stream
+        except Exception as e:
+            logger.warning(f"Generation stream from {self._core.model_arn} failed: {e}")
+            self._owner.breaker_for(self._core.model_arn).record_failure()
+            self._stream.close()
+            fallback = self._owner.retrieval_only(self.question, self._original_session_id, **self._retrieval)
+            # The interrupted turn may be missing from the new session, continue the previous one
+            self.session_id = self._original_session_id
+            self.citations = fallback.citations
+            text = ("\n\n" if self._stream.answer else "") + fallback.answer
+            self._fallback_chunks.append(text)
+            yield text
+        else:
+            self.citations = self._stream.citations
+
+    @property
+    def answer(self):
+        return self._stream.answer + "".join(self._fallback_chunks)
+
+    def close(self):
+        self._stream.close()
+
+
+def _close_result(future):
+    if not future.cancelled() and future.exception() is None:
+        _, result = future.result()
+        close = getattr(result, "close", None)
+        if close:
+            close()
+
+
+def _discard(futures):
+    """Close the result of calls that lost the race, such as an open EventStream, once they finish"""
+    for future in futures:
+        future.add_done_callback(_close_result)
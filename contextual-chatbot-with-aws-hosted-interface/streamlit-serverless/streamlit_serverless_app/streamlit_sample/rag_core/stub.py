@@ -0,0 +1,127 @@
+"""Local bedrock-agent-runtime stand-in that injects latency and throttling per model.
+
+Run `python -m rag_core.stub` from the streamlit_sample directory to compare tail latency
+of RagCore and ResilientRagCore against a degraded primary model without calling AWS.
+"""
+import random
+import threading
+import time
+import uuid
+
+from botocore.exceptions import ClientError
+
+
+class StubEventStream:
+    """Iterable of stream events that can fail part way through and records whether it was closed"""
+
+    def __init__(self, events, fail_after=None):
+        self._events = events
+        self._fail_after = fail_after
+        self.closed = False
+
+    def __iter__(self):
+        for i, event in enumerate(self._events):
+            if i == self._fail_after:
+                raise ClientError({"Error": {"Code": "ModelStreamErrorException", "Message": "Stream interrupted"}},
+                                  "RetrieveAndGenerateStream")
+            yield event
+
+    def close(self):
+        self.closed = True
+
+
+class LatencyInjectingClient:
+    """Implements retrieve, retrieve_and_generate and retrieve_and_generate_stream.
+
+    profiles maps a model ARN to (median_seconds, slow_probability, slow_seconds, throttle_probability)
+    with an optional fifth stream_failure_probability, the chance that a stream breaks after its first chunk.
+    Unlisted models answer after median_seconds of the "default" profile.
+    calls records (model_arn, sessionId) of every generation request, streams every stream returned.
+    """
+
+    def __init__(self, profiles=None, seed=None):
+        self.profiles = {"default": (0.05, 0.0, 0.0, 0.0), **(profiles or {})}
+        self.calls = []
+        self.streams = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _profile(self, model_arn):
+        median, slow_probability, slow_seconds, throttle_probability, *rest = self.profiles.get(
+            model_arn, self.profiles["default"])
+        return median, slow_probability, slow_seconds, throttle_probability, (rest[0] if rest else 0.0)
+
+    def _delay(self, model_arn, operation):
+        median, slow_probability, slow_seconds, throttle_probability, _ = self._profile(model_arn)
+        with self._lock:
+            throttled = self._random.random() < throttle_probability
+            slow = self._random.random() < slow_probability
+        if throttled:
+            raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, operation)
+        time.sleep(slow_seconds if slow else median)
+
+    def _answer(self, request, operation):
+        model_arn = request["retrieveAndGenerateConfiguration"]["knowledgeBaseConfiguration"]["modelArn"]
+        with self._lock:
+            self.calls.append((model_arn, request.get("sessionId")))
+        self._delay(model_arn, operation)
+        return model_arn, request.get("sessionId") or str(uuid.uuid4())
+
+    def retrieve(self, **request):
+        return {"retrievalResults": [
+            {"content": {"text": f"Passage about {request['retrievalQuery']['text']}"},
+             "location": {"s3Location": {"uri": "s3://stub-bucket/datasource/doc.pdf"}}}
+        ]}
+
+    def retrieve_and_generate(self, **request):
+        model_arn, session_id = self._answer(request, "RetrieveAndGenerate")
+        return {
+            "output": {"text": f"Answer from {model_arn}"},
+            "sessionId": session_id,
+            "citations": [{"retrievedReferences": self.retrieve(retrievalQuery=request["input"])["retrievalResults"]}]
+        }
+
+    def retrieve_and_generate_stream(self, **request):
+        model_arn, session_id = self._answer(request, "RetrieveAndGenerateStream")
+        with self._lock:
+            fails = self._random.random() < self._profile(model_arn)[4]
+        stream = StubEventStream([{"output": {"text": "Answer from "}}, {"output": {"text": model_arn}}],
+                                 fail_after=1 if fails else None)
+        with self._lock:
+            self.streams.setdefault(model_arn, []).append(stream)
+        return {"sessionId": session_id, "stream": stream}
+
+
+def _percentiles(latencies):
+    ordered = sorted(latencies)
+    return {p: round(ordered[int(p / 100 * (len(ordered) - 1))], 3) for p in (50, 95, 99)}
+
+
+def main(requests=200):
+    from rag_core.core import RagCore
+    from rag_core.resilience import ResilientRagCore
+
+    primary_arn, alternate_arn = "stub-primary", "stub-alternate"
+    client = LatencyInjectingClient({
+        # Primary: 10% of calls stall for 3s, 5% are throttled
+        primary_arn: (0.05, 0.10, 3.0, 0.05),
+        alternate_arn: (0.08, 0.0, 0.0, 0.0),
+    }, seed=7)
+    primary = RagCore("stub-kb", primary_arn, client=client)
+    resilient = ResilientRagCore(primary, [primary.with_model(alternate_arn)], timeout=5.0,
+                                 min_hedge_delay=0.2, max_hedge_delay=1.0)
+
+    for name, core in (("RagCore", primary), ("ResilientRagCore", resilient)):
+        latencies, errors = [], 0
+        for i in range(requests):
+            start = time.monotonic()
+            try:
+                core.query(f"question {i}")
+            except ClientError:
+                errors += 1
+            latencies.append(time.monotonic() - start)
+        print(f"{name}: latency seconds {_percentiles(latencies)}, errors {errors}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Publish the number of active Streamlit sessions on this task to CloudWatch"""
+import os
+import threading
+import time
+import uuid
+
+import boto3
+import streamlit as st
+from botocore.exceptions import ClientError, BotoCoreError
+
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "")
+METRICS_APP_NAME = os.getenv("METRICS_APP_NAME", "")
+# A session counts as active if it interacted within this window
+SESSION_IDLE_SECONDS = int(os.getenv("SESSION_IDLE_SECONDS", "900"))
+PUBLISH_INTERVAL_SECONDS = 60
+
+
+class ActiveSessionTracker:
+    """Track the last activity of each browser session and publish the active count every minute"""
+
+    def __init__(self):
+        self._last_seen = {}
+        self._lock = threading.Lock()
+        self._cloudwatch = boto3.Session().client('cloudwatch')
+        threading.Thread(target=self._publish_loop, daemon=True).start()
+
+    def touch(self, session_key):
+        with self._lock:
+            self._last_seen[session_key] = time.time()
+
+    def active_count(self):
+        cutoff = time.time() - SESSION_IDLE_SECONDS
+        with self._lock:
+            # Forget sessions that went idle so the map does not grow forever
+            self._last_seen = {k: v for k, v in self._last_seen.items() if v >= cutoff}
+            return len(self._last_seen)
+
+    def _publish_loop(self):
+        while True:
+            try:
+                self._cloudwatch.put_metric_data(
+                    Namespace=METRICS_NAMESPACE,
+                    MetricData=[{
+                        "MetricName": "ActiveSessions",
+                        "Dimensions": [{"Name": "AppName", "Value": METRICS_APP_NAME}],
+                        "Value": self.active_count(),
+                        "Unit": "Count"
+                    }]
+                )
+            except (ClientError, BotoCoreError) as e:
+                print(f"CloudWatch PutMetricData Error: {str(e)}")
+            time.sleep(PUBLISH_INTERVAL_SECONDS)
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def start_publisher():
+    """Start the tracker and its publisher thread once per process. No-op when metrics are not configured.
+
+    start.py calls this before the Streamlit server starts, so a freshly scaled-out task
+    reports 0 active sessions instead of nothing until its first browser session arrives.
+    """
+    global _tracker
+    if not (METRICS_NAMESPACE and METRICS_APP_NAME):
+        return None
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = ActiveSessionTracker()
+    return _tracker
+
+
+def record_session_activity():
+    """Mark the current browser session as active. No-op when metrics are not configured."""
+    tracker = start_publisher()
+    if tracker is None:
+        return
+    if "metricsSessionKey" not in st.session_state:
+        st.session_state["metricsSessionKey"] = str(uuid.uuid4())
+    tracker.touch(st.session_state["metricsSessionKey"])
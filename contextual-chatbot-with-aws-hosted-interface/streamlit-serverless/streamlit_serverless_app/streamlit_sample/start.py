@@ -0,0 +1,12 @@
+"""Start the active sessions publisher with the server process, then run Streamlit"""
+import sys
+
+from streamlit.web import cli
+
+import session_metrics
+
+if __name__ == "__main__":
+    # The app imports session_metrics from sys.modules, so it shares this tracker
+    session_metrics.start_publisher()
+    sys.argv = ["streamlit", "run", "streamlit_sample.py", "--server.port=8501", "--server.address=0.0.0.0"]
+    sys.exit(cli.main())
@@ -1,11 +1,54 @@
+import os
 import streamlit as st
 import boto3
 import json
-from botocore.exceptions import ClientError
+from botocore.exceptions import ClientError, BotoCoreError
+
+from rag_core import ResilientRagCore
+from session_metrics import record_session_activity
 
 region = boto3.Session().region_name
 session = boto3.Session(region_name=region)
-lambda_client = session.client('lambda')
+
+# "inprocess" calls Bedrock directly from this app, "lambda" goes through the InvokeKnowledgeBase function
+RAG_MODE = os.getenv("RAG_MODE", "inprocess")
+RAG_LAMBDA_FUNCTION = os.getenv("RAG_LAMBDA_FUNCTION", "InvokeKnowledgeBase")
+
+
+@st.cache_resource
+def get_rag_core():
+    # Shared by all sessions on this task, so latency history and circuit breakers are too
+    return ResilientRagCore.from_environment(session)
+
+
+@st.cache_resource
+def get_lambda_client():
+    return session.client('lambda')
+
+
+def ask_in_process(question, session_id):
+    """Stream the answer into the chat message and return (answer, sessionId)"""
+    stream = get_rag_core().stream(question, session_id)
+    answer = st.write_stream(stream)
+    return answer, stream.session_id
+
+
+def ask_lambda(question, session_id):
+    """Call lambda function to get response from the model and return (answer, sessionId)"""
+    payload = json.dumps({
+        "question": question,
+        "sessionId": session_id
+    })
+    result = get_lambda_client().invoke(
+        FunctionName=RAG_LAMBDA_FUNCTION,
+        Payload=payload
+    )
+    result = json.loads(result['Payload'].read().decode("utf-8"))
+    response = json.loads(result['body'])
+    answer = response['answer']
+    st.markdown(answer)
+    return answer, response['sessionId']
+
 
 st.title("Amazon Bedrock Powered AI Chat Assistant")
 
@@ -16,6 +59,9 @@ if "messages" not in st.session_state:
 if 'sessionId' not in st.session_state:
     st.session_state['sessionId'] = ""
 
+# Report this session as active for the ECS autoscaling metric
+record_session_activity()
+
 # Display chat messages from history on app rerun
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
@@ -28,40 +74,23 @@ if prompt := st.chat_input("Ask me anything"):
         question = prompt
         st.chat_message("user").markdown(question)
 
-        # Call lambda function to get response from the model
-        payload = json.dumps({
-            "question": prompt,
-            "sessionId": st.session_state['sessionId']
-        })
-        
         try:
-            result = lambda_client.invoke(
-                FunctionName='InvokeKnowledgeBase',
-                Payload=payload
-            )
-            
-            result = json.loads(result['Payload'].read().decode("utf-8"))
-            response = json.loads(result['body'])
-            answer = response['answer']
-            sessionId = response['sessionId']
+            # Display assistant response in chat message container
+            with st.chat_message("assistant"):
+                ask = ask_lambda if RAG_MODE == "lambda" else ask_in_process
+                answer, sessionId = ask(question, st.session_state['sessionId'])
 
             st.session_state['sessionId'] = sessionId
 
-            # Add user input to chat history
+            # Add user input and assistant response to chat history
             st.session_state.messages.append({"role": "user", "content": question})
-
-            # Display assistant response in chat message container
-            with st.chat_message("assistant"):
-                st.markdown(answer)
-
-            # Add assistant response to chat history
             st.session_state.messages.append({"role": "assistant", "content": answer})
 
-        except ClientError as e:
+        except (ClientError, BotoCoreError) as e:
             error_message = "Sorry, I'm having trouble connecting to the service. Please try again later."
             st.error(error_message)
-            print(f"AWS Lambda Error: {str(e)}")
-            
+            print(f"AWS Error: {str(e)}")
+
         except json.JSONDecodeError as e:
             error_message = "Sorry, I received an invalid response. Please try again."
             st.error(error_message)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# rag_core lives next to the Streamlit app that ships it in its container image
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "streamlit_serverless_app", "streamlit_sample"))
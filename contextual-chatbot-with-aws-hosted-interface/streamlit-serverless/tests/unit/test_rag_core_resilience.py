@@ -0,0 +1,157 @@
+import time
+
+from rag_core import CircuitBreaker, RagCore, ResilientRagCore
+from rag_core.stub import LatencyInjectingClient
+
+PRIMARY, ALTERNATE = "stub-primary", "stub-alternate"
+
+
+def make_core(profiles, **kwargs):
+    client = LatencyInjectingClient(profiles, seed=1)
+    primary = RagCore("stub-kb", PRIMARY, client=client)
+    return client, ResilientRagCore(primary, [primary.with_model(ALTERNATE)], **kwargs)
+
+
+def warm_up(core, method, seconds, samples=20):
+    for _ in range(samples):
+        core.latency_for(method, PRIMARY).record(seconds)
+
+
+def test_hedge_fires_after_p95_and_alternate_wins():
+    client, core = make_core({PRIMARY: (1.0, 0.0, 0.0, 0.0), ALTERNATE: (0.01, 0.0, 0.0, 0.0)},
+                             min_hedge_delay=0.05, max_hedge_delay=5.0)
+    warm_up(core, "query", 0.2)
+
+    start = time.monotonic()
+    result = core.query("What is the refund policy?")
+    elapsed = time.monotonic() - start
+
+    assert result.answer == f"Answer from {ALTERNATE}"
+    assert [arn for arn, _ in client.calls] == [PRIMARY, ALTERNATE]
+    assert 0.2 <= elapsed < 0.8
+
+
+def test_no_hedge_within_a_session():
+    client, core = make_core({PRIMARY: (0.3, 0.0, 0.0, 0.0), ALTERNATE: (0.01, 0.0, 0.0, 0.0)},
+                             min_hedge_delay=0.05)
+    warm_up(core, "query", 0.05)
+
+    result = core.query("And what about returns?", "session-1")
+
+    assert result.answer == f"Answer from {PRIMARY}"
+    assert client.calls == [(PRIMARY, "session-1")]
+
+
+def test_session_fails_over_after_an_error():
+    client, core = make_core({PRIMARY: (0.01, 0.0, 0.0, 1.0)})
+
+    result = core.query("And what about returns?", "session-1")
+
+    assert result.answer == f"Answer from {ALTERNATE}"
+    assert client.calls == [(PRIMARY, "session-1"), (ALTERNATE, "session-1")]
+
+
+def test_circuit_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.1)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.15)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_throttled_model_opens_its_breaker_and_recovers():
+    client, core = make_core({PRIMARY: (0.01, 0.0, 0.0, 1.0)}, failure_threshold=2, reset_timeout=0.1)
+    for _ in range(2):
+        core.query("What is the refund policy?")
+    assert core.breakers[PRIMARY].state == CircuitBreaker.OPEN
+
+    client.calls.clear()
+    core.query("What is the refund policy?")
+    assert [arn for arn, _ in client.calls] == [ALTERNATE]
+
+    client.profiles[PRIMARY] = (0.01, 0.0, 0.0, 0.0)
+    time.sleep(0.15)
+    result = core.query("What is the refund policy?")
+    assert result.answer == f"Answer from {PRIMARY}"
+    assert core.breakers[PRIMARY].state == CircuitBreaker.CLOSED
+
+
+def test_all_breakers_open_answers_from_retrieval():
+    client, core = make_core({"default": (0.01, 0.0, 0.0, 1.0)}, failure_threshold=1)
+    core.query("What is the refund policy?")
+    assert all(breaker.state == CircuitBreaker.OPEN for breaker in core.breakers.values())
+
+    client.calls.clear()
+    result = core.query("What is the refund policy?", "session-1")
+
+    assert client.calls == []
+    assert "Passage about What is the refund policy?" in result.answer
+    assert result.session_id == "session-1"
+    assert result.citations == [{"text": "Passage about What is the refund policy?",
+                                 "uri": "s3://stub-bucket/datasource/doc.pdf", "page": None}]
+
+
+def test_stream_falls_back_to_passages():
+    _, core = make_core({"default": (0.01, 0.0, 0.0, 1.0)}, failure_threshold=1)
+    core.query("What is the refund policy?")
+
+    stream = core.stream("What is the refund policy?")
+    chunks = list(stream)
+
+    assert len(chunks) == 1
+    assert "Passage about What is the refund policy?" in chunks[0]
+    assert stream.citations
+
+
+def test_mid_stream_error_records_failure_and_falls_back():
+    _, core = make_core({PRIMARY: (0.01, 0.0, 0.0, 0.0, 1.0)}, failure_threshold=1)
+
+    stream = core.stream("What is the refund policy?", "session-1")
+    chunks = list(stream)
+
+    assert chunks[0] == "Answer from "
+    assert "Passage about What is the refund policy?" in chunks[1]
+    assert stream.answer == "".join(chunks)
+    assert stream.session_id == "session-1"
+    assert stream.citations
+    assert core.breakers[PRIMARY].state == CircuitBreaker.OPEN
+
+
+def test_losing_stream_is_closed():
+    client, core = make_core({PRIMARY: (0.3, 0.0, 0.0, 0.0), ALTERNATE: (0.01, 0.0, 0.0, 0.0)},
+                             min_hedge_delay=0.05)
+    warm_up(core, "stream", 0.05)
+
+    stream = core.stream("What is the refund policy?")
+    assert "".join(stream) == f"Answer from {ALTERNATE}"
+
+    time.sleep(0.4)
+    assert [s.closed for s in client.streams[PRIMARY]] == [True]
+    assert [s.closed for s in client.streams[ALTERNATE]] == [False]
+
+
+def test_views_share_breakers_and_latency_per_model():
+    client, core = make_core({ALTERNATE: (0.01, 0.0, 0.0, 1.0)}, failure_threshold=2)
+    strong = core.primary.with_model("stub-strong")
+    light_view = core.with_models([core.cores[1], core.primary])
+    strong_view = core.with_models([core.cores[1], strong])
+
+    # One failure of the alternate in each view opens its single shared breaker
+    assert light_view.query("What is the refund policy?", "session-1").answer == f"Answer from {PRIMARY}"
+    assert strong_view.query("Why did sales drop?", "session-1").answer == "Answer from stub-strong"
+    assert core.breakers[ALTERNATE].state == CircuitBreaker.OPEN
+
+    client.calls.clear()
+    strong_view.query("Why did sales drop?", "session-1")
+    assert [arn for arn, _ in client.calls] == ["stub-strong"]
+    assert strong_view.latency_for("query", "stub-strong") is core.latency_for("query", "stub-strong")